@@ -0,0 +1,45 @@
+import re
+import sys
+import time
+
+from common import load_app, make_sentences
+
+# Times representative-sentence lookup for extract_themes on large synthetic
+# pages, comparing the sentence index with the previous per-keyword re.split
+# scan, and checks that both pick the same sentences.
+#
+#   python benchmarks/bench_sentences.py [sentences ...]
+
+scraper = load_app("shiny-scraper.py")
+
+def find_representative_sentence_scan(text, keyword):
+    sentences = re.split(r'(?<=[.!?])\s+|\n+', text)
+    candidates = []
+    for s in sentences:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', s, re.IGNORECASE):
+            cleaned = scraper.clean_sentence(s)
+            if cleaned:
+                candidates.append(cleaned)
+    if candidates:
+        return min(candidates, key=len)
+    return f"This page covers the theme '{keyword}'."
+
+def make_page(n_sentences, seed=0):
+    return " ".join(make_sentences(n_sentences, seed))
+
+def main(sizes):
+    keywords = ["rainfall", "united kingdom", "weather", "term7", "term1999", "snow", "climate is"] * 3
+    for n in sizes:
+        text = make_page(n)
+        start = time.perf_counter()
+        expected = [find_representative_sentence_scan(text, kw) for kw in keywords]
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index = scraper.build_sentence_index(text)
+        got = [scraper.find_representative_sentence(text, kw, index) for kw in keywords]
+        index_time = time.perf_counter() - start
+        assert got == expected, "sentence index picked different sentences"
+        print(f"{n:>8} sentences  {len(keywords)} keywords  scan {scan_time:8.3f}s  index {index_time:8.3f}s  x{scan_time / index_time:.1f}")
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [1000, 10000, 100000])
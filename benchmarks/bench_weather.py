@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from common import load_app, make_sentences, sample_words
+
+# End-to-end benchmark of the weather RAG pipeline on synthetic local corpora:
+# full build, no-change incremental rebuild, single and batched search, plus
+# the per-stage timings the app records and the peak traced memory of a build.
+# Search results are checked against the original cosine_similarity + argsort
+# ranking, including ties and questions matching fewer than k chunks.
+#
+#   python benchmarks/bench_weather.py [--words N ...] [--queries N] [--json PATH]
+
+WORDS_PER_FILE = 50_000
+
+def make_corpus(directory, n_words, seed=0):
+    os.makedirs(directory)
+    sentences = make_sentences(n_words, seed)
+    sources = []
+    written = 0
+    while written < n_words:
+        path = os.path.join(directory, f"source_{len(sources)}.txt")
+        with open(path, "w") as f:
+            in_file = 0
+            while in_file < WORDS_PER_FILE and written < n_words:
+                sentence = next(sentences)
+                f.write(sentence + " ")
+                n = len(sentence.split())
+                in_file += n
+                written += n
+        sources.append({"name": f"Synthetic {len(sources)}", "url": "file://" + path})
+    return sources
+
+def corpus_bytes(sources):
+    return sum(os.path.getsize(src["url"].replace("file://", "")) for src in sources)
+
+# The ranking search_index replaced: highest cosine first, ties and zero scores
+# broken towards the later chunk, as reversing a stable argsort does.
+def rank_reference(index, query, k):
+    sims = cosine_similarity(index["vectorizer"].transform([query]), index["embeddings"])[0]
+    return [index["docs"][i] for i in sims.argsort(kind="stable")[-k:][::-1]]
+
+def check_ranking(weather, index, queries, k=None):
+    k = k or weather.TOP_K
+    for query, got in zip(queries, weather.search_batch(index, queries, k)):
+        assert got == rank_reference(index, query, k), f"ranking differs for {query!r}"
+
+# Three identical sources give tied scores, and questions with one rare term or
+# no known terms need padding with zero-score chunks.
+def check_ties(weather):
+    os.makedirs("ties")
+    sources = []
+    for i, text in enumerate(["rain rain wind", "rain rain wind", "sun", "rain rain wind", "fog drizzle"]):
+        path = os.path.abspath(os.path.join("ties", f"{i}.txt"))
+        with open(path, "w") as f:
+            f.write(text)
+        sources.append({"name": f"Tie {i}", "url": "file://" + path})
+    index, errors = weather.build_index(sources)
+    assert not errors, errors
+    queries = ["rain", "wind rain", "sun", "fog", "snow", "", "rain sun fog", "drizzle wind"]
+    for k in (1, 2, 3, 5, 8):
+        check_ranking(weather, index, queries, k)
+
+def run_scale(weather, metrics, n_words, n_queries, measure_memory, seed=0):
+    shutil.rmtree("data", ignore_errors=True)
+    os.makedirs("data")
+    sources = make_corpus(os.path.join("corpus", str(n_words)), n_words, seed)
+    mb = corpus_bytes(sources) / 1e6
+    metrics.reset()
+
+    start = time.perf_counter()
+    index, errors = weather.build_index(sources)
+    build_time = time.perf_counter() - start
+    assert not errors, errors
+
+    start = time.perf_counter()
+    weather.build_index(sources, incremental=True)
+    rebuild_time = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    words = sample_words()
+    queries = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(n_queries)]
+    start = time.perf_counter()
+    for query in queries:
+        weather.search_index(index, query)
+    search_time = time.perf_counter() - start
+    start = time.perf_counter()
+    weather.search_batch(index, queries)
+    batch_time = time.perf_counter() - start
+    stages = metrics.snapshot()
+    check_ranking(weather, index, queries)
+
+    peak_mb = None
+    if measure_memory:
+        shutil.rmtree("data")
+        os.makedirs("data")
+        tracemalloc.start()
+        weather.build_index(sources)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+    return {
+        "words": n_words,
+        "mb": mb,
+        "chunks": len(index["docs"]),
+        "terms": len(index["vectorizer"].vocabulary_),
+        "build_s": build_time,
+        "build_mb_per_s": mb / build_time,
+        "incremental_rebuild_s": rebuild_time,
+        "search_qps": n_queries / search_time,
+        "batch_search_qps": n_queries / batch_time,
+        "build_peak_mb": peak_mb,
+        "stages": stages,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark index build and search for shiny-weather.py.")
+    parser.add_argument("--words", type=int, nargs="+", default=[100_000, 1_000_000], help="corpus sizes in words")
+    parser.add_argument("--queries", type=int, default=500, help="questions per search run")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced-memory build, which is slow")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    # The app keeps its index and fetch cache under ./data, so run in a scratch directory.
+    workdir = tempfile.mkdtemp(prefix="bench-weather-")
+    cwd = os.getcwd()
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(workdir)
+    try:
+        weather = load_app("shiny-weather.py")
+        metrics = weather.metrics
+        check_ties(weather)
+        results = []
+        for n_words in args.words:
+            result = run_scale(weather, metrics, n_words, args.queries, not args.no_memory)
+            results.append(result)
+            peak = f"{result['build_peak_mb']:8.1f}MB" if result["build_peak_mb"] is not None else "       -"
+            print(f"{n_words:>10} words {result['mb']:7.1f}MB {result['chunks']:>6} chunks  "
+                  f"build {result['build_s']:7.2f}s ({result['build_mb_per_s']:5.1f}MB/s)  "
+                  f"no-change rebuild {result['incremental_rebuild_s']:6.2f}s  "
+                  f"search {result['search_qps']:8.0f}q/s  batch {result['batch_search_qps']:8.0f}q/s  peak {peak}")
+            for name, stage in result["stages"].items():
+                print(f"{'':>12}{name:<24} n={stage['count']:<6} mean {stage['mean'] * 1000:9.2f}ms  max {stage['max'] * 1000:9.2f}ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
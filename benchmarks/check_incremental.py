@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from common import ROOT, load_app, make_sentences
+
+# Checks the change detection behind incremental rebuilds in shiny-weather.py
+# against a local http.server and local files: ETag and Last-Modified 304s,
+# unchanged mtimes, unchanged hashes, and that an incremental rebuild after a
+# change gives the same index as a full rebuild, with and without sources that
+# share a URL.
+#
+#   python benchmarks/check_incremental.py
+
+# Serves files with an ETag and answers If-None-Match under /etag/, ignores
+# conditional headers under /plain/, and otherwise behaves like http.server,
+# which answers If-Modified-Since. Every response status is logged.
+class Handler(SimpleHTTPRequestHandler):
+    statuses = []
+
+    def send_response(self, code, message=None):
+        self.statuses.append(code)
+        super().send_response(code, message)
+
+    def send_head(self):
+        if self.path.startswith("/plain/"):
+            self.path = self.path[len("/plain"):]
+            del self.headers["If-Modified-Since"]
+        elif self.path.startswith("/etag/"):
+            self.path = self.path[len("/etag"):]
+            del self.headers["If-Modified-Since"]
+            with open(self.translate_path(self.path), "rb") as f:
+                etag = '"%x"' % hash(f.read())
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return None
+            self.etag = etag
+        return super().send_head()
+
+    def end_headers(self):
+        if getattr(self, "etag", None):
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+# Last-Modified has one-second resolution, so each rewrite moves the mtime on
+# by a minute to keep a quick succession of writes distinguishable.
+def write_page(path, n_sentences, seed):
+    mtime = os.path.getmtime(path) + 60 if os.path.exists(path) else None
+    with open(path, "w") as f:
+        f.write("<html><title>Sample</title><body><main>" + " ".join(make_sentences(n_sentences, seed)) + "</main></body></html>")
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+def same_index(a, b):
+    assert a["docs"] == b["docs"], "docs differ"
+    assert a["vectorizer"].vocabulary_ == b["vectorizer"].vocabulary_, "vocabularies differ"
+    assert (a["vectorizer"].idf_ == b["vectorizer"].idf_).all(), "idf weights differ"
+    assert a["embeddings"].shape == b["embeddings"].shape and (a["embeddings"] != b["embeddings"]).nnz == 0, "embeddings differ"
+
+def full_build(weather, sources):
+    shutil.rmtree("data")
+    index, errors = weather.build_index(sources)
+    assert not errors, errors
+    return index
+
+def check_http(weather, base):
+    for prefix, key in [("/etag/", "etag"), ("/", "last_modified")]:
+        url = base + prefix + "page.html"
+        page, entry = weather.fetch_page_if_changed(url)
+        assert page and page["chunks"] and entry.get(key), (url, entry)
+        Handler.statuses.clear()
+        page, entry = weather.fetch_page_if_changed(url, entry)
+        assert page is None and Handler.statuses == [304], (url, Handler.statuses)
+    url = base + "/plain/page.html"
+    page, entry = weather.fetch_page_if_changed(url)
+    Handler.statuses.clear()
+    page, entry = weather.fetch_page_if_changed(url, entry)
+    assert page is None and Handler.statuses == [200], Handler.statuses
+    print("http: ETag 304, Last-Modified 304 and unchanged hash ok")
+
+def check_file(weather):
+    path = os.path.abspath("site/notes.txt")
+    with open(path, "w") as f:
+        f.write(" ".join(make_sentences(200, 1)))
+    url = "file://" + path
+    page, entry = weather.fetch_page_if_changed(url)
+    assert page and entry["mtime"] and entry["hash"], entry
+    page, same = weather.fetch_page_if_changed(url, entry)
+    assert page is None and same == entry, "unchanged mtime should report no change"
+    os.utime(path, (entry["mtime"] + 10, entry["mtime"] + 10))
+    page, touched = weather.fetch_page_if_changed(url, entry)
+    assert page is None and touched["hash"] == entry["hash"], "touched file with the same text should be unchanged"
+    print("file: unchanged mtime and unchanged hash ok")
+
+def check_rebuild(weather, sources, label):
+    expected = full_build(weather, sources)
+    for _ in range(3):
+        index, errors = weather.build_index(sources, incremental=True)
+        assert not errors, errors
+        same_index(index, expected)
+    write_page("site/page.html", 300, 7)
+    index, errors = weather.build_index(sources, incremental=True)
+    assert not errors, errors
+    same_index(index, full_build(weather, sources))
+    print(f"{label}: incremental rebuild matches full rebuild ({len(index['docs'])} chunks)")
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="check-incremental-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    server = None
+    try:
+        os.makedirs("data")
+        os.makedirs("site")
+        write_page("site/page.html", 3000, 0)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory="site"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        weather = load_app("shiny-weather.py")
+
+        check_http(weather, base)
+        check_file(weather)
+        sample = "file://" + os.path.join(ROOT, "weather_sample.txt")
+        check_rebuild(weather, [
+            {"name": "Page", "url": base + "/page.html"},
+            {"name": "Page (ETag)", "url": base + "/etag/page.html"},
+            {"name": "Sample", "url": sample},
+        ], "distinct sources")
+        write_page("site/page.html", 3000, 0)
+        check_rebuild(weather, [
+            {"name": "Sample", "url": sample},
+            {"name": "Page", "url": base + "/page.html"},
+            {"name": "Sample again", "url": sample},
+            {"name": "Page again", "url": base + "/page.html"},
+        ], "duplicate URLs")
+    finally:
+        if server:
+            server.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import re
+import sys
+import random
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Loading shiny-scraper.py would otherwise start loading KeyBERT in a background
+# thread, competing with whatever is being timed.
+os.environ["SCRAPER_WARM_MODEL"] = "0"
+
+# The apps have hyphenated file names, so load them by path.
+def load_app(filename):
+    name = os.path.splitext(filename)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def sample_words(n_synthetic=2000):
+    with open(os.path.join(ROOT, "weather_sample.txt"), "r") as f:
+        words = re.findall(r"\w+", f.read())
+    return words + [f"term{i}" for i in range(n_synthetic)]
+
+# Sentences of 4-30 words drawn from weather_sample.txt plus synthetic terms,
+# so the vocabulary grows with the corpus the way real pages do.
+def make_sentences(n_sentences, seed=0):
+    rng = random.Random(seed)
+    words = sample_words()
+    for _ in range(n_sentences):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(4, 30)))
+        yield sentence.capitalize() + rng.choice([".", "!", "?", "\n"])
@@ -0,0 +1,101 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# Shared HTTP layer for both Shiny apps: one pooled Session, a cap on concurrent
+# requests per host, and failures returned as data rather than raised.
+
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 4
+DEFAULT_TIMEOUT = 10
+
+_lock = threading.Lock()
+_session = None
+_host_slots = {}
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def host_slot(url):
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_slots[host]
+
+def fetch_error(kind, message, status=None):
+    return {"kind": kind, "message": message, "status": status}
+
+# With max_bytes set, the body is streamed and cut off after that many bytes,
+# and "truncated" says whether it was.
+@metrics.timed("fetch.http")
+def fetch(url, headers=None, timeout=DEFAULT_TIMEOUT, max_bytes=None):
+    result = {"url": url, "status": None, "headers": {}, "text": None, "truncated": False, "error": None}
+    try:
+        with host_slot(url), get_session().get(url, headers=headers, timeout=timeout, stream=True) as resp:
+            result["status"] = resp.status_code
+            result["headers"] = resp.headers
+            if resp.status_code == 304:
+                return result
+            resp.raise_for_status()
+            result["text"], result["truncated"] = read_text(resp, max_bytes)
+    except requests.Timeout as e:
+        result["error"] = fetch_error("timeout", str(e))
+    except requests.HTTPError as e:
+        result["error"] = fetch_error("http", str(e), e.response.status_code)
+    except requests.ConnectionError as e:
+        result["error"] = fetch_error("connection", str(e))
+    except requests.RequestException as e:
+        result["error"] = fetch_error("request", str(e))
+    return result
+
+def read_text(resp, max_bytes=None):
+    if max_bytes is None:
+        return resp.text, False
+    body = bytearray()
+    truncated = False
+    for block in resp.iter_content(64 * 1024):
+        body += block
+        if len(body) > max_bytes:
+            del body[max_bytes:]
+            truncated = True
+            break
+    return body.decode(resp.encoding or "utf-8", errors="replace"), truncated
+
+# Runs fn over items on a thread pool and yields (item, result, error) in the
+# order calls finish. Anything still running when the deadline (in seconds)
+# passes is yielded with a "deadline" error and left to finish unobserved.
+def map_as_completed(fn, items, deadline=None, max_workers=MAX_WORKERS):
+    items = list(items)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    futures = {pool.submit(fn, item): item for item in items}
+    started = time.monotonic()
+    done = set()
+    try:
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                done.add(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield futures[future], None, fetch_error("error", str(e))
+                else:
+                    yield futures[future], result, None
+        except FuturesTimeout:
+            elapsed = time.monotonic() - started
+            for future, item in futures.items():
+                if future not in done:
+                    yield item, None, fetch_error("deadline", f"Not finished after {elapsed:.1f}s")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,91 @@
+import json
+import time
+import bisect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# Per-stage latency counters for both Shiny apps. Each named stage keeps a
+# count, total, max and a fixed-bucket histogram, cheap enough to leave on in
+# production. Read them with snapshot(), dump() or the /metrics route.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_stages = {}
+
+def record(name, seconds):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+        stage["count"] += 1
+        stage["total"] += seconds
+        stage["max"] = max(stage["max"], seconds)
+        stage["buckets"][bisect.bisect_left(BUCKETS, seconds)] += 1
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timed(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Upper bound of the bucket holding the q-th quantile, or the max if it falls
+# in the overflow bucket.
+def quantile(stage, q):
+    target = q * stage["count"]
+    seen = 0
+    for bound, n in zip(BUCKETS, stage["buckets"]):
+        seen += n
+        if n and seen >= target:
+            return bound
+    return stage["max"]
+
+def snapshot():
+    with _lock:
+        stages = {name: dict(stage, buckets=list(stage["buckets"])) for name, stage in _stages.items()}
+    result = {}
+    for name, stage in sorted(stages.items()):
+        result[name] = {
+            "count": stage["count"],
+            "total": stage["total"],
+            "mean": stage["total"] / stage["count"],
+            "max": stage["max"],
+            "p50": quantile(stage, 0.5),
+            "p95": quantile(stage, 0.95),
+            "histogram": {f"le_{bound:g}": n for bound, n in zip(BUCKETS, stage["buckets"])} | {"le_inf": stage["buckets"][-1]},
+        }
+    return result
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+def dump(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+
+def summary():
+    return "\n".join(f"{name}: n={s['count']} mean={s['mean'] * 1000:.1f}ms p95<={s['p95'] * 1000:g}ms max={s['max'] * 1000:.1f}ms" for name, s in snapshot().items())
+
+# Wraps a Shiny app so GET /metrics returns snapshot() as JSON.
+def with_metrics_route(app):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Mount, Route
+
+    async def endpoint(request):
+        return JSONResponse(snapshot())
+
+    return Starlette(routes=[Route("/metrics", endpoint), Mount("/", app=app)])
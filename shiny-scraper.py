@@ -1,8 +1,20 @@
 from shiny import App, ui, render, reactive
-import requests
 from bs4 import BeautifulSoup
-from keybert import KeyBERT
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import os
 import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+import multiprocessing
+import fetcher
+import metrics
 
 def read_html_file(filename):
     try:
@@ -19,7 +31,69 @@ header_html = read_html_file(HEADER_HTML_FILE)
 wrapper_start_html = read_html_file(WRAPPER_START_HTML_FILE)
 wrapper_end_html = read_html_file(WRAPPER_END_HTML_FILE)
 
-kw_model = KeyBERT()
+THEME_CACHE_DIR = os.path.join("data", "themes")
+THEME_CACHE_SIZE = 256
+
+# KeyBERT pulls in sentence-transformers, so the model is only built on first
+# use, or by warm_kw_model() in the background while the app starts serving.
+_kw_model = None
+_kw_model_lock = threading.Lock()
+
+def get_kw_model():
+    global _kw_model
+    with _kw_model_lock:
+        if _kw_model is None:
+            from keybert import KeyBERT
+            _kw_model = KeyBERT()
+        return _kw_model
+
+def warm_kw_model():
+    threading.Thread(target=get_kw_model, daemon=True).start()
+
+# Keyword results keyed by a hash of the text and top_n: an in-process LRU in
+# front of one JSON file per key, so repeat scrapes skip the model entirely.
+_theme_cache = OrderedDict()
+_theme_cache_lock = threading.Lock()
+
+def theme_cache_key(text, top_n):
+    return hashlib.sha256(f"{top_n}\n{text}".encode("utf-8")).hexdigest()
+
+def remember_keywords(key, keywords):
+    with _theme_cache_lock:
+        _theme_cache[key] = keywords
+        _theme_cache.move_to_end(key)
+        if len(_theme_cache) > THEME_CACHE_SIZE:
+            _theme_cache.popitem(last=False)
+
+# Returns the keywords cached under key without touching the model, or None
+# on a miss.
+@metrics.timed("scraper.keyword_cache")
+def cached_keywords(key):
+    with _theme_cache_lock:
+        if key in _theme_cache:
+            _theme_cache.move_to_end(key)
+            return _theme_cache[key]
+    path = os.path.join(THEME_CACHE_DIR, key + ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        keywords = [tuple(kw) for kw in json.load(f)]
+    remember_keywords(key, keywords)
+    return keywords
+
+# Runs the model and caches the result under key, which is
+# theme_cache_key(text, top_n).
+@metrics.timed("scraper.keyword_model")
+def extract_keywords(text, top_n, key):
+    keywords = get_kw_model().extract_keywords(text, top_n=top_n, stop_words="english")
+    path = os.path.join(THEME_CACHE_DIR, key + ".json")
+    os.makedirs(THEME_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(keywords, f)
+    os.replace(tmp_path, path)
+    remember_keywords(key, keywords)
+    return keywords
 
 def clean_sentence(sentence):
     s = sentence.strip()
@@ -29,44 +103,128 @@ def clean_sentence(sentence):
         return None
     return s
 
-def find_representative_sentence(text, keyword):
-    sentences = re.split(r'(?<=[.!?])\s+|\n+', text)
-    candidates = []
-    for s in sentences:
-        if re.search(r'\b' + re.escape(keyword) + r'\b', s, re.IGNORECASE):
-            cleaned = clean_sentence(s)
-            if cleaned:
-                candidates.append(cleaned)
-    if candidates:
-        return min(candidates, key=len)
+# Splits and cleans the text once. Only sentences that survive clean_sentence
+# can be picked, so only those are kept, with an index from lower-cased word to
+# the sentences containing it. Sentences with non-ASCII words are listed
+# separately and always checked, since re.IGNORECASE folds some Unicode letters
+# (e.g. "ſ" and "s") that lower() does not.
+@metrics.timed("scraper.sentence_index")
+def build_sentence_index(text):
+    sentences = []
+    postings = {}
+    unicode_ids = []
+    for raw in re.split(r'(?<=[.!?])\s+|\n+', text):
+        cleaned = clean_sentence(raw)
+        if not cleaned:
+            continue
+        i = len(sentences)
+        sentences.append((raw, cleaned))
+        if raw.isascii():
+            tokens = set(re.findall(r'\w+', raw.lower()))
+        else:
+            tokens = set(re.findall(r'\w+', raw))
+            if not all(t.isascii() for t in tokens):
+                unicode_ids.append(i)
+                continue
+            tokens = {t.lower() for t in tokens}
+        for token in tokens:
+            postings.setdefault(token, []).append(i)
+    return {"sentences": sentences, "postings": postings, "unicode_ids": unicode_ids}
+
+@metrics.timed("scraper.representative_sentence")
+def find_representative_sentence(text, keyword, index=None):
+    if index is None:
+        index = build_sentence_index(text)
+    sentences = index["sentences"]
+    tokens = [t.lower() for t in re.findall(r'\w+', keyword)]
+    if tokens and all(t.isascii() for t in tokens):
+        # Every word of a matching keyphrase must appear in the sentence, so
+        # intersect the postings, smallest first, before running the regex.
+        lists = sorted((index["postings"].get(t, []) for t in set(tokens)), key=len)
+        ids = set(lists[0]).intersection(*lists[1:])
+        ids = sorted(ids.union(index["unicode_ids"]))
+    else:
+        ids = range(len(sentences))
+    pattern = re.compile(r'\b' + re.escape(keyword) + r'\b', re.IGNORECASE)
+    best = None
+    for i in ids:
+        raw, cleaned = sentences[i]
+        if (best is None or len(cleaned) < len(best)) and pattern.search(raw):
+            best = cleaned
+    if best:
+        return best
     return f"This page covers the theme '{keyword}'."
 
-def extract_themes(text, top_n=5):
-    keywords = kw_model.extract_keywords(text, top_n=top_n, stop_words="english")
+# Returns None instead of themes if cancelled is set before the model call or
+# before the sentence lookups. A model call already running cannot be stopped,
+# so cached keywords are checked first and never wait on a cancelled scrape.
+def extract_theme_list(text, top_n=5, cancelled=None):
+    key = theme_cache_key(text, top_n)
+    keywords = cached_keywords(key)
+    if keywords is None:
+        if cancelled and cancelled.is_set():
+            return None
+        keywords = extract_keywords(text, top_n, key)
     if not keywords:
+        return []
+    if cancelled and cancelled.is_set():
+        return None
+    index = build_sentence_index(text)
+    return [{"keyword": kw, "score": score, "sentence": find_representative_sentence(text, kw, index)} for kw, score in keywords]
+
+@metrics.timed("scraper.extract_themes")
+def extract_themes(text, top_n=5):
+    return format_themes(extract_theme_list(text, top_n=top_n))
+
+def format_themes(themes):
+    if not themes:
         return "No major themes detected."
     conversational = []
-    for kw, _ in keywords:
-        sent = find_representative_sentence(text, kw)
-        conversational.append(f"**Theme: {kw}**\n{sent}")
+    for theme in themes:
+        conversational.append(f"**Theme: {theme['keyword']}**\n{theme['sentence']}")
     return "\n\n".join(conversational)
 
+@metrics.timed("scraper.get_page_words")
 def get_page_words(url):
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
+    resp = fetcher.fetch(url, timeout=10)
+    if resp["error"]:
+        return {"url": url, "words": "", "error": resp["error"]}
+    with metrics.timer("scraper.parse"):
+        soup = BeautifulSoup(resp["text"], "html.parser")
         for tag in soup(["script", "style", "noscript"]):
             tag.decompose()
         texts = soup.stripped_strings
         words = " ".join(texts)
-        return words
-    except Exception as e:
-        return f"Error: {e}"
+    return {"url": url, "words": words, "error": None}
 
 def count_words(text):
     return len(re.findall(r'\b\w+\b', text))
 
+# The whole scrape pipeline, run on SCRAPE_POOL so a slow page or model call
+# never blocks the Shiny event loop. Once cancelled is set it stops at the next
+# stage boundary: after the fetch, before the model call and before the
+# sentence lookups. A KeyBERT call already in progress runs to completion.
+SCRAPE_POOL = ThreadPoolExecutor(max_workers=4)
+
+def scrape_and_extract(url, report=lambda stage: None, cancelled=None):
+    report("Fetching page...")
+    page = get_page_words(url)
+    if page["error"] or (cancelled and cancelled.is_set()):
+        return page
+    report("Extracting themes...")
+    themes = extract_theme_list(page["words"], cancelled=cancelled)
+    if themes is None:
+        return page
+    page["themes"] = format_themes(themes)
+    page["wordcount"] = count_words(page["words"])
+    return page
+
+# Start loading the model as soon as the app is imported. Run as a script for
+# batch mode, the parent only fetches and each worker process loads its own.
+# Set SCRAPER_WARM_MODEL=0 to skip warming, e.g. when benchmarking.
+if __name__ != "__main__" and os.environ.get("SCRAPER_WARM_MODEL", "1") != "0":
+    warm_kw_model()
+
 app_ui = ui.page_fluid(
     ui.HTML(header_html),
     ui.HTML(wrapper_start_html),
@@ -77,7 +235,9 @@ app_ui = ui.page_fluid(
             class_="govuk-form-group"
         ),
         ui.tags.div(
-            ui.input_action_button("scrape", "Scrape page"),
+            ui.input_task_button("scrape", "Scrape page", label_busy="Scraping..."),
+            ui.input_action_button("cancel", "Cancel"),
+            ui.tags.p(ui.output_text("scrape_status", inline=True), class_="govuk-body"),
             class_="govuk-form-group"
         ),
         ui.tags.div(
@@ -97,25 +257,214 @@ app_ui = ui.page_fluid(
 )
 
 def server(input, output, session):
+    progress = {"stage": ""}
+
+    @ui.bind_task_button(button_id="scrape")
+    @reactive.extended_task
+    async def scrape_task(url):
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(SCRAPE_POOL, scrape_and_extract, url, lambda stage: progress.update(stage=stage), cancelled)
+        finally:
+            cancelled.set()
+
     @reactive.effect
     @reactive.event(input.scrape)
     def _():
         url = input.url()
+        ui.update_text_area("themes", value="")
+        ui.update_text("wordcount", value="")
         if url:
-            words = get_page_words(url)
-            if words.startswith("Error:"):
-                ui.update_text_area("words", value=words)
-                ui.update_text_area("themes", value="")
-                ui.update_text("wordcount", value="")
-            else:
-                ui.update_text_area("words", value=words)
-                themes = extract_themes(words)
-                ui.update_text_area("themes", value=themes)
-                wc = count_words(words)
-                ui.update_text("wordcount", value=str(wc))
+            ui.update_text_area("words", value="")
+            scrape_task(url)
         else:
             ui.update_text_area("words", value="Please enter a URL.")
-            ui.update_text_area("themes", value="")
-            ui.update_text("wordcount", value="")
 
-app = App(app_ui, server)
+    @reactive.effect
+    @reactive.event(input.cancel)
+    def _():
+        scrape_task.cancel()
+
+    @render.text
+    def scrape_status():
+        status = scrape_task.status()
+        if status == "running":
+            reactive.invalidate_later(0.5)
+            return progress["stage"]
+        if status == "cancelled":
+            return "Scrape cancelled."
+        if status == "error":
+            return f"Scrape failed: {scrape_task.error()}"
+        return ""
+
+    @reactive.effect
+    def _():
+        if scrape_task.status() != "success":
+            return
+        page = scrape_task.result()
+        if page["error"]:
+            ui.update_text_area("words", value=f"Error: {page['error']['message']}")
+        else:
+            ui.update_text_area("words", value=page["words"])
+            ui.update_text_area("themes", value=page["themes"])
+            ui.update_text("wordcount", value=str(page["wordcount"]))
+
+app = metrics.with_metrics_route(App(app_ui, server))
+
+# --- Batch mode ---
+# python shiny-scraper.py urls.txt -o audit.jsonl [--workers N] [--top-n N]
+# Pages are fetched concurrently in this process, themes are extracted in a
+# process pool with one KeyBERT model per worker, and one JSON record per URL is
+# appended to the output as soon as it is ready. URLs with an error-free record
+# in the output are skipped, so an interrupted run picks up where it left off
+# and failed URLs are retried, except pages that crash a worker ("worker"
+# errors); the last record for a URL is the current one.
+BATCH_FETCH_WINDOW = 64
+
+def timed_page_words(url):
+    start = time.perf_counter()
+    page = get_page_words(url)
+    page["fetch_time"] = time.perf_counter() - start
+    return page
+
+def batch_extract(url, words, fetch_time, top_n=5):
+    start = time.perf_counter()
+    themes = extract_theme_list(words, top_n=top_n)
+    timings = {"fetch": fetch_time, "extract": time.perf_counter() - start}
+    return {"url": url, "word_count": count_words(words), "themes": themes, "timings": timings, "error": None}
+
+def batch_error(url, error, fetch_time=None):
+    return {"url": url, "word_count": None, "themes": None, "timings": {"fetch": fetch_time}, "error": error}
+
+# A URL is done once it has a result, or once it has killed a worker on its
+# own, so a resumed run neither repeats it nor crashes on it again.
+def read_done_urls(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record["error"] is None or record["error"]["kind"] == "worker":
+                    done.add(record["url"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+# When a worker dies, the pages in flight on that pool are retried one at a
+# time on a fresh pool once the rest are done, and only a page that kills a
+# worker by itself is recorded as a "worker" error. Raises BrokenProcessPool
+# if a new pool cannot run anything at all (e.g. the model fails to load);
+# URLs without a record at that point are picked up by rerunning the command.
+def run_batch(urls, output, workers=None, top_n=5):
+    done = read_done_urls(output)
+    todo = [url for url in dict.fromkeys(urls) if url not in done]
+    workers = workers or os.cpu_count() or 1
+    # Spawn rather than fork: the fetch threads are running when workers start.
+    context = multiprocessing.get_context("spawn")
+
+    def start_pool():
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=get_kw_model)
+        try:
+            pool.submit(count_words, "").result()
+        except BrokenProcessPool:
+            pool.shutdown()
+            raise BrokenProcessPool("theme extraction workers exited before running any page") from None
+        return pool
+
+    with open(output, "a+", encoding="utf-8") as out:
+        out.seek(0, os.SEEK_END)
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                out.write("\n")
+
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+        # Returns True if the pool broke, leaving the pages it lost in suspects.
+        def collect(futures):
+            broken = False
+            for future in futures:
+                url, words, fetch_time = pending.pop(future)
+                try:
+                    write(future.result())
+                except BrokenProcessPool:
+                    suspects.append((url, words, fetch_time))
+                    broken = True
+                except Exception as e:
+                    write(batch_error(url, fetcher.fetch_error("error", str(e)), fetch_time))
+            return broken
+
+        def restart():
+            nonlocal pool
+            collect(wait(pending).done)
+            pool.shutdown()
+            pool = start_pool()
+
+        def submit(url, words, fetch_time):
+            try:
+                future = pool.submit(batch_extract, url, words, fetch_time, top_n)
+            except BrokenProcessPool:
+                restart()
+                future = pool.submit(batch_extract, url, words, fetch_time, top_n)
+            pending[future] = (url, words, fetch_time)
+
+        pending = {}
+        suspects = []
+        pool = start_pool()
+        try:
+            for start in range(0, len(todo), BATCH_FETCH_WINDOW):
+                for url, page, error in fetcher.map_as_completed(timed_page_words, todo[start:start + BATCH_FETCH_WINDOW]):
+                    if error:
+                        write(batch_error(url, error))
+                    elif page["error"]:
+                        write(batch_error(url, page["error"], page["fetch_time"]))
+                    else:
+                        submit(url, page["words"], page["fetch_time"])
+                # Keep the pool busy without holding every fetched page in memory.
+                while len(pending) > workers * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    if collect(finished):
+                        restart()
+            if collect(wait(pending).done):
+                restart()
+            for url, words, fetch_time in suspects:
+                try:
+                    write(pool.submit(batch_extract, url, words, fetch_time, top_n).result())
+                except BrokenProcessPool:
+                    write(batch_error(url, fetcher.fetch_error("worker", "theme extraction worker exited while processing this page"), fetch_time))
+                    pool.shutdown()
+                    pool = start_pool()
+                except Exception as e:
+                    write(batch_error(url, fetcher.fetch_error("error", str(e)), fetch_time))
+        finally:
+            pool.shutdown()
+    return len(todo), len(dict.fromkeys(urls)) - len(todo)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape a list of URLs and write word counts and themes as JSON lines.")
+    parser.add_argument("urls", nargs="?", default="-", help="file with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--workers", type=int, default=None, help="theme extraction processes (default: CPU count)")
+    parser.add_argument("--top-n", type=int, default=5, help="themes per page")
+    parser.add_argument("--metrics", help="write fetch and parse timings from this process as JSON")
+    args = parser.parse_args(argv)
+    source = sys.stdin if args.urls == "-" else open(args.urls, "r", encoding="utf-8")
+    with source:
+        urls = [line.strip() for line in source if line.strip() and not line.startswith("#")]
+    try:
+        scraped, skipped = run_batch(urls, args.output, workers=args.workers, top_n=args.top_n)
+    except BrokenProcessPool as e:
+        print(f"Stopped: {e}. Rerun the same command to resume the remaining URLs.", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.metrics:
+            metrics.dump(args.metrics)
+    print(f"Scraped {scraped} URLs, skipped {skipped} already in {args.output}.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,31 @@
 import os
 import json
-import requests
+import types
+import shutil
+import asyncio
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from bs4 import BeautifulSoup
 from shiny import App, ui, render, reactive, Inputs, Outputs, Session
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from concurrent.futures import ThreadPoolExecutor
+import fetcher
+import metrics
 
 DATA_DIR = "data"
-INDEX_PATH = os.path.join(DATA_DIR, "index.json")
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+FETCH_CACHE_PATH = os.path.join(DATA_DIR, "fetch_cache.json")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 TOP_K = 5
 CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 0
+READ_BLOCK_SIZE = 1 << 20
+MAX_PAGE_BYTES = 20 * 1024 * 1024
+BUILD_DEADLINE = 60
 
 
 DEFAULT_SOURCES = [
@@ -22,36 +35,207 @@ DEFAULT_SOURCES = [
     }
 ]
 
+# Pages carry their text as "pieces", an iterable of strings read lazily, so a
+# large source is never held in memory whole. They carry an "error" dict from
+# fetcher.fetch_error instead when the source could not be read, so failures
+# are never indexed as document text.
 def fetch_page(url):
     if url.startswith("file://"):
         path = url.replace("file://", "")
         try:
-            with open(path, "r") as f:
-                text = f.read()
-            return {"url": url, "title": "Local Weather Sample", "text": text}
-        except Exception as e:
-            return {"url": url, "title": "Local Weather Sample", "text": f"Error reading file: {e}"}
-    else:
+            f = open(path, "r")
+        except OSError as e:
+            return {"url": url, "title": "Local Weather Sample", "pieces": [], "error": fetcher.fetch_error("io", str(e))}
+        return {"url": url, "title": "Local Weather Sample", "pieces": read_blocks(f), "truncated": False, "error": None}
+    resp = fetcher.fetch(url, timeout=8, max_bytes=MAX_PAGE_BYTES)
+    if resp["error"]:
+        return {"url": url, "title": url, "pieces": [], "error": resp["error"]}
+    return {**parse_page(url, resp["text"]), "truncated": resp["truncated"]}
+
+def read_blocks(f, block_size=READ_BLOCK_SIZE):
+    with f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+@metrics.timed("weather.parse_page")
+def parse_page(url, html):
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string if soup.title else url
+    main = soup.find("main") or soup.find("article") or soup.body
+    text = main.get_text(separator="\n") if main else soup.get_text(separator="\n")
+    return {"url": url, "title": title, "pieces": [text], "truncated": False, "error": None}
+
+def load_fetch_cache(path=FETCH_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_fetch_cache(cache, path=FETCH_CACHE_PATH):
+    with open(path + ".tmp", "w") as f:
+        json.dump(cache, f)
+    os.replace(path + ".tmp", path)
+
+# Returns (page, entry), with page set to None when the source is unchanged since
+# the cached entry, or carrying an "error" when it could not be read. Changed
+# pages come back with their "chunks"; the text is hashed while it is chunked,
+# so each source is read once. Local files are checked by mtime, web pages by a conditional
+# GET, and both fall back to comparing a hash of the extracted text.
+@metrics.timed("weather.fetch_source")
+def fetch_page_if_changed(url, entry=None):
+    entry = dict(entry or {})
+    if url.startswith("file://"):
         try:
-            resp = requests.get(url, timeout=8)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            title = soup.title.string if soup.title else url
-            main = soup.find("main") or soup.find("article") or soup.body
-            text = main.get_text(separator="\n") if main else soup.get_text(separator="\n")
-            return {"url": url, "title": title, "text": text}
-        except Exception as e:
-            return {"url": url, "title": url, "text": f"Error fetching: {e}"}
-
-def chunk_text(text, chunk_size=CHUNK_SIZE):
-    words = text.split()
-    return [" ".join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
-
-def build_index(sources):
-    docs = []
-    for src in sources:
-        page = fetch_page(src["url"])
-        for i, chunk in enumerate(chunk_text(page["text"])):
+            mtime = os.path.getmtime(url.replace("file://", ""))
+        except OSError:
+            mtime = None
+        if mtime is not None and entry.get("mtime") == mtime and entry.get("hash"):
+            return None, entry
+        page = fetch_page(url)
+        entry["mtime"] = mtime
+    else:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        resp = fetcher.fetch(url, headers=headers, timeout=8, max_bytes=MAX_PAGE_BYTES)
+        if resp["error"]:
+            return {"url": url, "title": url, "pieces": [], "error": resp["error"]}, entry
+        if resp["status"] == 304:
+            return None, entry
+        page = {**parse_page(url, resp["text"]), "truncated": resp["truncated"]}
+        entry["etag"] = resp["headers"].get("ETag")
+        entry["last_modified"] = resp["headers"].get("Last-Modified")
+    if page["error"]:
+        return page, entry
+    entry["truncated"] = page["truncated"]
+    digest = hashlib.sha256()
+    try:
+        with metrics.timer("weather.chunk"):
+            page["chunks"] = list(iter_chunks(hash_pieces(page["pieces"], digest)))
+    except (OSError, UnicodeDecodeError) as e:
+        return {**page, "error": fetcher.fetch_error("io", str(e))}, entry
+    if entry.get("hash") == digest.hexdigest():
+        return None, entry
+    entry["hash"] = digest.hexdigest()
+    return page, entry
+
+def hash_pieces(pieces, digest):
+    for piece in pieces:
+        digest.update(piece.encode("utf-8"))
+        yield piece
+
+# Yields chunk_size-word chunks as the text streams in, holding at most one
+# piece plus one chunk of words. Consecutive chunks share the last `overlap`
+# words; with no overlap this splits exactly like text.split().
+def iter_chunks(pieces, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be at least 0 and less than chunk_size")
+    step = chunk_size - overlap
+    words = []
+    carry = ""
+    emitted = False
+    for piece in pieces:
+        piece = carry + piece
+        parts = piece.split()
+        # The piece may end part-way through a word; finish it with the next one.
+        carry = parts.pop() if parts and not piece[-1].isspace() else ""
+        words.extend(parts)
+        while len(words) >= chunk_size:
+            yield " ".join(words[:chunk_size])
+            del words[:step]
+            emitted = True
+    if carry:
+        words.append(carry)
+    while len(words) > (overlap if emitted else 0):
+        yield " ".join(words[:chunk_size])
+        del words[:step]
+        emitted = True
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    return list(iter_chunks([text], chunk_size, overlap))
+
+def count_terms(texts):
+    cv = CountVectorizer()
+    try:
+        counts = cv.fit_transform(texts)
+    except ValueError:
+        return sp.csr_matrix((len(texts), 0), dtype=np.int64), []
+    return counts.tocsr(), sorted(cv.vocabulary_, key=cv.vocabulary_.get)
+
+# Stacks (counts, vocab) blocks onto one sorted vocabulary, the same column order
+# TfidfVectorizer would produce, dropping terms no remaining chunk uses.
+def merge_counts(blocks):
+    vocab = sorted(set().union(*(terms for _, terms in blocks)))
+    pos = {term: i for i, term in enumerate(vocab)}
+    mats = []
+    for counts, terms in blocks:
+        col_map = np.array([pos[t] for t in terms], dtype=np.int64)
+        mats.append(sp.csr_matrix((counts.data, col_map[counts.indices], counts.indptr), shape=(counts.shape[0], len(vocab))))
+    counts = sp.vstack(mats, format="csr")
+    used = np.flatnonzero(np.bincount(counts.indices, minlength=len(vocab)))
+    if len(used) < len(vocab):
+        counts = counts[:, used]
+        vocab = [vocab[i] for i in used]
+    return counts, vocab
+
+def make_vectorizer(vocab, idf):
+    vectorizer = TfidfVectorizer(vocabulary={term: i for i, term in enumerate(vocab)})
+    vectorizer.idf_ = idf
+    return vectorizer
+
+# Sources are fetched concurrently and chunked as each one arrives. With
+# incremental=True, sources that have not changed since the last build keep
+# their chunks and term counts from the saved index; only changed sources are
+# re-chunked and counted. IDF weights are then recomputed over the whole corpus,
+# so the result is identical to a full rebuild. Sources that fail keep their
+# previous chunks, if any, and are reported in the returned errors list, as are
+# pages cut off at MAX_PAGE_BYTES (those are still indexed).
+@metrics.timed("weather.build_index")
+def build_index(sources, incremental=False, deadline=BUILD_DEADLINE):
+    previous = load_index() if incremental else None
+    prev_rows = {}
+    prev_terms = load_counts() if previous else None
+    if prev_terms:
+        prev_docs = previous["docs"]
+        prev_counts, prev_vocab = prev_terms
+        # Sources sharing a URL each hold a copy of its chunks, one run per
+        # source starting at chunk_id 0. Reuse only the first copy, since every
+        # source with that URL is given the same chunks.
+        copies = {}
+        for i, doc in enumerate(prev_docs):
+            if doc["chunk_id"] == 0 or doc["url"] not in copies:
+                copies.setdefault(doc["url"], []).append([])
+            copies[doc["url"]][-1].append(i)
+        prev_rows = {url: runs[0] for url, runs in copies.items()}
+    cache = load_fetch_cache() if incremental else {}
+    entries = {url: cache.get(url) for url in prev_rows}
+    fetched = [(None, [])] * len(sources)
+    errors = []
+    def fetch_source(item):
+        return fetch_page_if_changed(item[1]["url"], entries.get(item[1]["url"]))
+    for (pos, src), result, error in fetcher.map_as_completed(fetch_source, enumerate(sources), deadline=deadline):
+        page, entry = result or ({"url": src["url"], "title": src["url"], "pieces": [], "error": error}, None)
+        if page is not None and page["error"]:
+            errors.append({"source_name": src["name"], "url": src["url"], **page["error"]})
+            continue
+        cache[src["url"]] = entry
+        if entry and entry.get("truncated"):
+            errors.append({"source_name": src["name"], "url": src["url"], **fetcher.fetch_error("truncated", f"page larger than {MAX_PAGE_BYTES} bytes, only the start was indexed")})
+        fetched[pos] = (page, page["chunks"] if page else [])
+    docs, reused, new_texts, order = [], [], [], []
+    for src, (page, chunks) in zip(sources, fetched):
+        if page is None:
+            for i in prev_rows.get(src["url"], []):
+                docs.append({**prev_docs[i], "source_name": src["name"]})
+                order.append(("reused", len(reused)))
+                reused.append(i)
+            continue
+        for i, chunk in enumerate(chunks):
             docs.append({
                 "source_name": src["name"],
                 "url": src["url"],
@@ -59,34 +243,196 @@ def build_index(sources):
                 "chunk_id": i,
                 "chunk_text": chunk
             })
-    vectorizer = TfidfVectorizer().fit([doc["chunk_text"] for doc in docs])
-    X = vectorizer.transform([doc["chunk_text"] for doc in docs])
-    embeddings = X.toarray()
-    with open(INDEX_PATH, "w") as f:
-        json.dump(docs, f)
-    return docs, vectorizer, embeddings
-
-def search_index(docs, embeddings, vectorizer, query, k=TOP_K):
-    q_vec = vectorizer.transform([query]).toarray()
-    sims = cosine_similarity(q_vec, embeddings)[0]
-    top_idx = sims.argsort()[-k:][::-1]
-    return [docs[i] for i in top_idx]
+            order.append(("new", len(new_texts)))
+            new_texts.append(chunk)
+    blocks = []
+    if reused:
+        blocks.append((prev_counts[reused], prev_vocab))
+    if new_texts:
+        blocks.append(count_terms(new_texts))
+    if not blocks:
+        raise ValueError("No sources could be indexed: " + "; ".join(f"{e['url']} ({e['message']})" for e in errors))
+    counts, vocab = merge_counts(blocks)
+    if not vocab:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    counts = counts[[i if kind == "reused" else len(reused) + i for kind, i in order]]
+    tfidf = TfidfTransformer().fit(counts)
+    embeddings = tfidf.transform(counts).tocsr()
+    index = make_index(docs, make_vectorizer(vocab, tfidf.idf_), embeddings)
+    save_index(index, counts)
+    save_fetch_cache(cache)
+    return index, errors
+
+# Indexes are shared between sessions and threads, so they are built read-only:
+# a mapping proxy over a tuple of docs and matrices with non-writeable arrays.
+def make_index(docs, vectorizer, embeddings, postings=None):
+    if postings is None:
+        postings = embeddings.T.tocsr()
+    for matrix in (embeddings, postings):
+        for array in (matrix.data, matrix.indices, matrix.indptr):
+            array.flags.writeable = False
+    return types.MappingProxyType({"docs": tuple(docs), "vectorizer": vectorizer, "embeddings": embeddings, "postings": postings})
+
+# On-disk index: one file per array so the matrices can be memory-mapped on load.
+# "postings" is the transpose of the chunk x term embeddings, i.e. an inverted
+# index from each term to the chunks that contain it.
+def save_csr(index_dir, prefix, matrix):
+    np.save(os.path.join(index_dir, prefix + "data.npy"), matrix.data)
+    np.save(os.path.join(index_dir, prefix + "indices.npy"), matrix.indices)
+    np.save(os.path.join(index_dir, prefix + "indptr.npy"), matrix.indptr)
+
+def load_csr(index_dir, prefix, n_cols):
+    data = np.load(os.path.join(index_dir, prefix + "data.npy"), mmap_mode="r")
+    indices = np.load(os.path.join(index_dir, prefix + "indices.npy"), mmap_mode="r")
+    indptr = np.load(os.path.join(index_dir, prefix + "indptr.npy"), mmap_mode="r")
+    return sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_cols), copy=False)
+
+def save_index(index, counts, index_dir=INDEX_DIR):
+    tmp_dir = index_dir + ".tmp"
+    old_dir = index_dir + ".old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    vectorizer = index["vectorizer"]
+    vocab = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    with open(os.path.join(tmp_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(tmp_dir, "docs.json"), "w") as f:
+        json.dump(index["docs"], f)
+    np.save(os.path.join(tmp_dir, "idf.npy"), vectorizer.idf_)
+    save_csr(tmp_dir, "", index["embeddings"])
+    save_csr(tmp_dir, "postings_", index["postings"])
+    save_csr(tmp_dir, "counts_", counts)
+    # Swap directories by rename so readers never see a half-written index and
+    # existing memory maps keep pointing at the old files until they are dropped.
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.rename(index_dir, old_dir)
+    os.rename(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def load_index(index_dir=INDEX_DIR):
+    if not os.path.exists(os.path.join(index_dir, "postings_indptr.npy")):
+        return None
+    with open(os.path.join(index_dir, "vocab.json")) as f:
+        vocab = json.load(f)
+    with open(os.path.join(index_dir, "docs.json")) as f:
+        docs = json.load(f)
+    vectorizer = make_vectorizer(vocab, np.load(os.path.join(index_dir, "idf.npy")))
+    embeddings = load_csr(index_dir, "", len(vocab))
+    postings = load_csr(index_dir, "postings_", len(docs))
+    return make_index(docs, vectorizer, embeddings, postings)
+
+# Raw term counts per chunk, kept so incremental rebuilds can recompute IDF.
+def load_counts(index_dir=INDEX_DIR):
+    if not os.path.exists(os.path.join(index_dir, "counts_indptr.npy")):
+        return None
+    with open(os.path.join(index_dir, "vocab.json")) as f:
+        vocab = json.load(f)
+    return load_csr(index_dir, "counts_", len(vocab)), vocab
+
+# Picks the k best of the chunks that share a term with the query. Ties, and the
+# zero-score chunks used to pad out short result lists, are ordered by
+# descending chunk number, as a stable argsort of every score reversed would.
+def top_k(candidates, scores, k, n_docs):
+    if len(candidates) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        candidates, scores = candidates[keep], scores[keep]
+    top = candidates[np.lexsort((-candidates, -scores))[:k]].tolist()
+    if len(top) < min(k, n_docs):
+        taken = set(top)
+        i = n_docs - 1
+        while len(top) < min(k, n_docs):
+            if i not in taken:
+                top.append(i)
+            i -= 1
+    return top
+
+# Scores every question in one sparse product against the inverted index, so
+# only chunks sharing a term with a question are touched. Rows are
+# L2-normalised by TfidfVectorizer, so the dot product is the cosine.
+@metrics.timed("weather.search_batch")
+def search_batch(index, queries, k=TOP_K):
+    scores = (index["vectorizer"].transform(queries) @ index["postings"]).tocsr()
+    docs = index["docs"]
+    results = []
+    for i in range(len(queries)):
+        row = slice(scores.indptr[i], scores.indptr[i + 1])
+        results.append([docs[j] for j in top_k(scores.indices[row], scores.data[row], k, len(docs))])
+    return results
+
+@metrics.timed("weather.search_index")
+def search_index(index, query, k=TOP_K):
+    return search_batch(index, [query], k)[0]
 
 def answer_with_rag(query, hits):
     context = "\n\n".join([f"[Source {i+1}] {hit['title']} ({hit['url']})\n---\n{hit['chunk_text'][:300]}" for i, hit in enumerate(hits)])
     return f"(Demo) Would answer: {query}\n\n{context[:500]}..."
 
+# One index per process, shared by every session. Rebuilds run on REBUILD_POOL
+# and publish by replacing the (version, index) pair in a single assignment,
+# so searches already holding the old index finish on it. Sessions poll the
+# version to learn when a new index is live.
+STARTUP_INDEX = load_index()
+REBUILD_POOL = ThreadPoolExecutor(max_workers=1)
+
+_live_index = (1, STARTUP_INDEX) if STARTUP_INDEX else (0, None)
+_rebuild_lock = threading.Lock()
+_rebuild_running = None
+_rebuild_queued = []
+
+def live_index():
+    return _live_index
+
+def live_version():
+    return _live_index[0]
+
+def publish_index(index):
+    global _live_index
+    with _rebuild_lock:
+        _live_index = (_live_index[0] + 1, index)
+        return _live_index[0]
+
+def rebuild_and_publish(sources, incremental=False):
+    index, errors = build_index(sources, incremental=incremental)
+    return publish_index(index), errors
+
+def run_rebuild(job):
+    global _rebuild_running
+    with _rebuild_lock:
+        _rebuild_queued.remove(job)
+        _rebuild_running = job
+    return rebuild_and_publish(*job["args"])
+
+# Starts a background rebuild and returns its future, which resolves to
+# (version, errors). A request with the same sources and incremental flag as
+# the running rebuild, or one already queued behind it, shares that rebuild;
+# anything else is queued to run after them with its own arguments.
+def request_rebuild(sources, incremental=False):
+    args = (sources, incremental)
+    with _rebuild_lock:
+        running = [_rebuild_running] if _rebuild_running and not _rebuild_running["future"].done() else []
+        for job in running + _rebuild_queued:
+            if job["args"] == args:
+                return job["future"]
+        job = {"args": args}
+        job["future"] = REBUILD_POOL.submit(run_rebuild, job)
+        _rebuild_queued.append(job)
+        return job["future"]
+
 # --- UI ---
 app_ui = ui.page_fluid(
     ui.h2("UK Weather Q&A (RAG, Local Demo)"),
     ui.layout_sidebar(
         ui.sidebar(
-            ui.input_action_button("rebuild", "Rebuild Index"),
+            ui.input_task_button("rebuild", "Rebuild Index", label_busy="Rebuilding..."),
+            ui.input_checkbox("incremental", "Only refetch changed sources", value=True),
             ui.hr(),
             ui.output_table("sources_tbl"),
         ),
         ui.div(
             ui.output_ui("status"),
+            ui.tags.details(ui.tags.summary("Timings"), ui.output_code("timings")),
             ui.input_text_area("question", "Ask about UK weather:", rows=3, placeholder="e.g., What is the climate like in Scotland?"),
             ui.input_action_button("ask", "Ask"),
             ui.output_ui("answer"),
@@ -100,40 +446,71 @@ app_ui = ui.page_fluid(
 # --- Server ---
 def server(input: Inputs, output: Outputs, session: Session):
     sources = reactive.value(DEFAULT_SOURCES)
-    docs = reactive.value([])
-    vectorizer = reactive.value(None)
-    embeddings = reactive.value(None)
-    status_msg = reactive.value("Index ready.")
+    last_hits = reactive.value([])
+    answer_msg = reactive.value("")
+
+    @reactive.poll(live_version, 1)
+    def live():
+        return live_index()
+
+    @ui.bind_task_button(button_id="rebuild")
+    @reactive.extended_task
+    async def rebuild_task(srcs, incremental):
+        return await asyncio.wrap_future(request_rebuild(srcs, incremental))
+
+    @render.table
+    def sources_tbl():
+        return pd.DataFrame(sources())
 
     @reactive.effect
+    @reactive.event(input.rebuild)
     def _():
-        output.sources_tbl = render.table(lambda: pd.DataFrame(sources()))
+        rebuild_task(sources(), input.incremental())
 
-    @input.rebuild.click
-    def _():
-        output.status = render.ui(lambda: "Building index, please wait...")
-        try:
-            d, v, e = build_index(sources())
-            docs.set(d)
-            vectorizer.set(v)
-            embeddings.set(e)
-            status_msg.set("Index rebuilt successfully.")
-        except Exception as ex:
-            status_msg.set(f"Error building index: {ex}")
-        output.status = render.ui(lambda: status_msg())
-
-    @input.ask.click
+    @render.ui
+    def status():
+        version, index = live()
+        state = rebuild_task.status()
+        if state == "running":
+            return f"Building index in the background; questions use version {version} until it is ready." if index else "Building index, please wait..."
+        if state == "error":
+            return f"Error building index: {rebuild_task.error()}"
+        if index is None:
+            return "No saved index. Please rebuild."
+        msg = f"Index version {version} live ({len(index['docs'])} chunks)."
+        if state == "success":
+            _, errors = rebuild_task.result()
+            if errors:
+                msg += f" Last rebuild: {len(errors)} source problem(s): " + "; ".join(f"{err['url']} ({err['message']})" for err in errors)
+        return msg
+
+    @render.code
+    def timings():
+        reactive.invalidate_later(5)
+        return metrics.summary() or "No timings recorded yet."
+
+    @reactive.effect
+    @reactive.event(input.ask)
     def _():
-        if not docs() or vectorizer() is None or embeddings() is None:
-            output.status = render.ui(lambda: "Index not ready. Please rebuild.")
+        _, index = live()
+        if index is None or not index["docs"]:
+            last_hits.set([])
+            answer_msg.set("Index not ready. Please rebuild.")
             return
-        hits = search_index(docs(), embeddings(), vectorizer(), input.question())
-        output.hits = render.table(lambda: pd.DataFrame([{
+        found = search_index(index, input.question())
+        last_hits.set(found)
+        answer_msg.set(answer_with_rag(input.question(), found))
+
+    @render.ui
+    def answer():
+        return answer_msg()
+
+    @render.table
+    def hits():
+        return pd.DataFrame([{
             "rank": i+1,
             "title": hit["title"][:80],
             "url": hit["url"]
-        } for i, hit in enumerate(hits)]))
-        output.answer = render.ui(lambda: answer_with_rag(input.question(), hits))
-        output.status = render.ui(lambda: status_msg())
+        } for i, hit in enumerate(last_hits())])
 
-app = App(app_ui, server)
\ No newline at end of file
+app = metrics.with_metrics_route(App(app_ui, server))
\ No newline at end of file